@@ -1,11 +1,80 @@
+import asyncio
+import aiohttp
 import gspread
-from google.oauth2.service_account import Credentials
+import orjson
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from google.auth.exceptions import TransportError
+from google.oauth2.service_account import Credentials
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 import time
-import socket
-import urllib3
+import hashlib
+import os
+import shelve
+
+
+# Sheet columns filled in by the updater, mapped to their metadata keys
+FIELD_MAPPING = {
+    'Author': 'authors',
+    'Genre': 'categories',
+    'Publisher': 'publisher',
+    'Publication Year': 'published_date',
+    'ISBN': 'isbn'
+}
+
+
+def _is_transient_error(exc):
+    """Return True for errors worth retrying (rate limiting, server errors and dropped connections)."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in (429, 500, 502, 503, 504)
+    return isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+def _isbn13(identifiers):
+    """Return the first ISBN-13 from a Google Books industryIdentifiers list."""
+    return next((i['identifier'] for i in identifiers if i.get('type') == 'ISBN_13'), '')
+
+
+_jittered_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _retry_wait(retry_state):
+    """Honor the server's Retry-After header, otherwise back off exponentially with jitter."""
+    exc = retry_state.outcome.exception()
+    headers = getattr(exc, 'headers', None) or {}
+    retry_after = headers.get('Retry-After', '')
+    if retry_after.isdigit():
+        return min(float(retry_after), 60)
+    return _jittered_backoff(retry_state)
+
+
+class _TokenBucket:
+    """Client-side rate limiter allowing bursts of `capacity` requests at `rate` requests per second."""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            
+    def drain(self):
+        """Empty the bucket after the server has told us to slow down."""
+        self._refill()
+        self.tokens = 0
+
 
 class BookMetadataUpdater:
     def __init__(self):
@@ -16,31 +85,28 @@ class BookMetadataUpdater:
         self.GOOGLE_BOOKS_API_URL = "https://www.googleapis.com/books/v1/volumes"
         self.OPEN_LIBRARY_API_URL = "https://openlibrary.org/search.json"
         
-        # Configure retry strategy
-        self.retry_strategy = Retry(
-            total=5,  # number of retries
-            backoff_factor=1,  # wait 1, 2, 4, 8, 16 seconds between retries
-            status_forcelist=[500, 502, 503, 504],  # HTTP status codes to retry on
-            allowed_methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
-        )
-        # Create session with retry strategy
-        self.http = requests.Session()
-        self.http.mount("https://", HTTPAdapter(max_retries=self.retry_strategy))
+        # Concurrency limits for the API fetches
+        self.max_concurrent_books = 10
+        self.max_connections = 32
+        self.max_connections_per_host = 16
+        
+        # On-disk cache of API results; book metadata rarely changes
+        self.cache_file = os.path.join('cache', 'book_meta')
+        self.cache_ttl = 30 * 24 * 60 * 60  # 30 days
+        self._cache = {}
+        
+        # Queued cell updates are written once this many pile up or this many seconds pass
+        self.write_batch_size = 500
+        self.write_interval = 10
+        
+        # Per-host rate limits
+        self._buckets = {
+            'googleapis.com': _TokenBucket(rate=5.0, capacity=10),
+            'openlibrary.org': _TokenBucket(rate=2.0, capacity=5)
+        }
         
-    def check_internet_connection(self):
-        """Test internet connectivity."""
-        try:
-            # Try to resolve Google's DNS
-            socket.create_connection(("8.8.8.8", 53), timeout=3)
-            return True
-        except OSError:
-            return False
-
     def authenticate_google_sheets(self):
         """Authenticate with Google Sheets API using service account."""
-        if not self.check_internet_connection():
-            raise ConnectionError("No internet connection available. Please check your connection and try again.")
-            
         try:
             creds = Credentials.from_service_account_file(
                 'credentials.json',
@@ -50,148 +116,295 @@ class BookMetadataUpdater:
         except Exception as e:
             raise Exception(f"Authentication failed: {str(e)}")
 
-    def get_google_books_data(self, title):
+    async def _fetch_json(self, session, host, url, params):
+        """GET a URL and decode its JSON body, retrying transient failures."""
+        bucket = self._buckets[host]
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(6),  # 5 retries after the first attempt
+            wait=_retry_wait,  # roughly 1, 2, 4, 8, 16 seconds, spread out so requests don't retry in lockstep
+            retry=retry_if_exception(_is_transient_error),
+            reraise=True
+        ):
+            with attempt:
+                await bucket.acquire()
+                async with session.get(url, params=params,
+                                       timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 429:
+                        bucket.drain()  # Back off every pending request to this host
+                    response.raise_for_status()
+                    return orjson.loads(await response.read())
+
+    async def _cached(self, api, title, fetch):
+        """Return the cached result for a title, calling fetch() when missing or expired.
+        
+        Expired entries are still served if the refresh fails with a network error.
+        """
+        key = hashlib.sha1(f"{api}:{title.lower().strip()}".encode()).hexdigest()
+        entry = self._cache.get(key)
+        if entry and time.time() - entry['fetched_at'] < self.cache_ttl:
+            return entry['data']
+            
+        try:
+            data = await fetch()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if entry:
+                return entry['data']
+            raise
+            
+        self._cache[key] = {'fetched_at': time.time(), 'data': data}
+        return data
+
+    async def get_google_books_data(self, session, title):
         """Fetch book metadata from Google Books API with retries."""
         if not title:
             return None
             
         try:
-            params = {'q': title, 'maxResults': 1}
-            response = self.http.get(self.GOOGLE_BOOKS_API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'items' in data and len(data['items']) > 0:
-                book_info = data['items'][0]['volumeInfo']
-                return {
-                    'title': book_info.get('title', ''),
-                    'authors': ', '.join(book_info.get('authors', [])),
-                    'publisher': book_info.get('publisher', ''),
-                    'published_date': book_info.get('publishedDate', '')[:4],  # Get year only
-                    'isbn': next((id for id in book_info.get('industryIdentifiers', []) 
-                                if id['type'] == 'ISBN_13'), {}).get('identifier', ''),
-                    'categories': ', '.join(book_info.get('categories', []))
-                }
-            return None
-        except requests.RequestException as e:
+            return await self._cached('google_books', title,
+                                      lambda: self._fetch_google_books(session, title))
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
             print(f"Error fetching Google Books data for '{title}': {e}")
             return None
 
-    def get_open_library_data(self, title):
+    async def _fetch_google_books(self, session, title):
+        """Query Google Books and normalize the first result."""
+        params = {'q': title, 'maxResults': 1}
+        data = await self._fetch_json(session, 'googleapis.com', self.GOOGLE_BOOKS_API_URL, params)
+        
+        if 'items' in data and len(data['items']) > 0:
+            book_info = data['items'][0]['volumeInfo']
+            return {
+                'title': book_info.get('title', ''),
+                'authors': ', '.join(book_info.get('authors', [])),
+                'publisher': book_info.get('publisher', ''),
+                'published_date': book_info.get('publishedDate', '')[:4],  # Get year only
+                'isbn': _isbn13(book_info.get('industryIdentifiers', [])),
+                'categories': ', '.join(book_info.get('categories', []))
+            }
+        return None
+
+    async def get_open_library_data(self, session, title):
         """Fetch book metadata from Open Library API with retries."""
         if not title:
             return None
             
         try:
-            params = {'title': title, 'limit': 1}
-            response = self.http.get(self.OPEN_LIBRARY_API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'docs' in data and len(data['docs']) > 0:
-                book_info = data['docs'][0]
-                return {
-                    'title': book_info.get('title', ''),
-                    'authors': ', '.join(book_info.get('author_name', [])),
-                    'publisher': ', '.join(book_info.get('publisher', [])),
-                    'published_date': str(book_info.get('first_publish_year', '')),
-                    'isbn': next(iter(book_info.get('isbn', [])), ''),
-                    'subjects': ', '.join(book_info.get('subject', []))
-                }
-            return None
-        except requests.RequestException as e:
+            return await self._cached('open_library', title,
+                                      lambda: self._fetch_open_library(session, title))
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
             print(f"Error fetching Open Library data for '{title}': {e}")
             return None
 
+    async def _fetch_open_library(self, session, title):
+        """Query Open Library and normalize the first result."""
+        params = {'title': title, 'limit': 1}
+        data = await self._fetch_json(session, 'openlibrary.org', self.OPEN_LIBRARY_API_URL, params)
+        
+        if 'docs' in data and len(data['docs']) > 0:
+            book_info = data['docs'][0]
+            return {
+                'title': book_info.get('title', ''),
+                'authors': ', '.join(book_info.get('author_name', [])),
+                'publisher': ', '.join(book_info.get('publisher', [])),
+                'published_date': str(book_info.get('first_publish_year', '')),
+                'isbn': next(iter(book_info.get('isbn', [])), ''),
+                'subjects': ', '.join(book_info.get('subject', []))
+            }
+        return None
+
     def merge_metadata(self, google_data, open_library_data):
         """Merge metadata from both APIs, preferring Google Books data."""
         if not google_data and not open_library_data:
             return None
             
-        merged = {}
-        if google_data:
-            merged.update(google_data)
-        if open_library_data:
-            # Fill in missing data from Open Library
-            for key in merged.keys():
-                if not merged[key] and open_library_data.get(key):
-                    merged[key] = open_library_data[key]
-            # Add genre from Open Library subjects if missing
-            if 'categories' not in merged or not merged['categories']:
-                merged['categories'] = open_library_data.get('subjects', '')
-                
+        # Google Books wins wherever it has a value, Open Library fills the rest
+        merged = {**(open_library_data or {}),
+                  **{key: value for key, value in (google_data or {}).items() if value}}
+        # Open Library reports genres as subjects
+        if not merged.get('categories') and open_library_data:
+            merged['categories'] = open_library_data.get('subjects', '')
+            
         return merged
 
+    async def _settle(self, task, api_name, title):
+        """Await an API task, turning unexpected failures into "no data" for that API."""
+        try:
+            return await task
+        except Exception as e:
+            print(f"Unexpected error fetching {api_name} data for '{title}': {e}")
+            return None
+
+    async def _fetch_book(self, session, title, needed):
+        """Fetch both APIs for a title concurrently, dropping Open Library if Google Books covers every needed field.
+        
+        A failure in one API never discards the other's result or aborts the rest of the run.
+        """
+        google_task = asyncio.ensure_future(self.get_google_books_data(session, title))
+        open_library_task = asyncio.ensure_future(self.get_open_library_data(session, title))
+        
+        google_data = await self._settle(google_task, 'Google Books', title)
+        if google_data and all(google_data.get(FIELD_MAPPING[field]) for field in needed):
+            open_library_task.cancel()
+            return google_data, None
+        return google_data, await self._settle(open_library_task, 'Open Library', title)
+
+    async def _fetch_all(self, books, on_result):
+        """Fetch Google Books and Open Library data for every (title, needed fields) pair concurrently.
+        
+        on_result(index, google_data, open_library_data) is a coroutine awaited as soon as each book's data arrives.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_books)
+        # Keep connections to both API hosts open and reuse them across requests
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+            keepalive_timeout=60
+        )
+        
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        self._cache = shelve.open(self.cache_file)
+        try:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                async def fetch_and_handle(index, title, needed):
+                    async with semaphore:
+                        result = await self._fetch_book(session, title, needed)
+                    await on_result(index, *result)
+                    
+                await asyncio.gather(*(fetch_and_handle(index, title, needed)
+                                       for index, (title, needed) in enumerate(books)))
+        finally:
+            self._cache.close()
+            self._cache = {}
+
+    def _flush_updates(self, worksheet, batch):
+        """Write all queued cell updates to the sheet in one request; on failure they stay in batch."""
+        if not batch:
+            return
+        try:
+            worksheet.batch_update(batch, value_input_option='USER_ENTERED')
+        except Exception as e:
+            print(f"Error writing {len(batch)} cells to the sheet: {e}")
+            return
+        print(f"Wrote {len(batch)} cells to the sheet")
+        batch.clear()
+
     def update_sheet(self, spreadsheet_name='Books list', sheet_name='Books'):
         """Update Google Sheet with merged metadata."""
         try:
-            # Check internet connection first
-            if not self.check_internet_connection():
-                print("No internet connection. Please check your connection and try again.")
-                return
-
             # Connect to Google Sheets
             print("Authenticating with Google Sheets...")
             gc = self.authenticate_google_sheets()
             
             print(f"Opening spreadsheet '{spreadsheet_name}'...")
-            spreadsheet = gc.open(spreadsheet_name)
+            try:
+                spreadsheet = gc.open(spreadsheet_name)
+            except (requests.exceptions.ConnectionError, TransportError):
+                # The first API call (including the token fetch) doubles as the connectivity check
+                raise ConnectionError("No internet connection available. Please check your connection and try again.")
             worksheet = spreadsheet.worksheet(sheet_name)
             
-            # Get all records
+            # Get all rows as plain lists; the first one is the header
             print("Fetching existing records...")
-            records = worksheet.get_all_records()
+            values = worksheet.get_all_values()
+            if not values:
+                print("No records found in the sheet.")
+                return
+            header, rows = values[0], values[1:]
+            
+            # Map header names to column numbers once instead of searching per cell
+            col_map = {name: idx + 1 for idx, name in enumerate(header)}
+            
+            def cell(row, field):
+                return row[col_map[field] - 1] if field in col_map else ''
+                
+            # Only fill columns the sheet actually has
+            missing_columns = [field for field in FIELD_MAPPING if field not in col_map]
+            if missing_columns:
+                print(f"Warning: columns not found in sheet, skipping: {', '.join(missing_columns)}")
+            target_fields = [field for field in FIELD_MAPPING if field in col_map]
             
-            # Update each row
-            for i, row in enumerate(records, start=2):  # start=2 because row 1 is headers
-                title = str(row.get('Title', '')).strip()
-                if not bool(title):
+            # Collect the rows that have a title, grouped by normalized title
+            title_to_rows = {}
+            for i, row in enumerate(rows, start=2):  # start=2 because row 1 is headers
+                title = cell(row, 'Title').strip()
+                if not title:
                     continue
                     
-                print(f"\nProcessing: {title}")
+                # Skip rows that are already complete without calling the APIs
+                needed = [field for field in target_fields if not cell(row, field)]
+                if not needed:
+                    continue
+                title_to_rows.setdefault(title.casefold(), []).append((i, title, needed))
                 
-                # Get metadata from both APIs
-                print("Fetching from Google Books API...")
-                google_data = self.get_google_books_data(title)
-                time.sleep(1)  # Rate limiting
+            # Fetch each unique title once, for every field any of its rows is missing
+            unique_titles = list(title_to_rows)
+            books = []
+            for key in unique_titles:
+                group = title_to_rows[key]
+                needed_by_any = {field for _, _, needed in group for field in needed}
+                books.append((group[0][1], [field for field in target_fields if field in needed_by_any]))
                 
-                print("Fetching from Open Library API...")
-                open_library_data = self.get_open_library_data(title)
-                time.sleep(1)  # Rate limiting
+            # Update each row as its metadata arrives, writing in windows
+            batch = []
+            last_flush = time.monotonic()
+            flushing = False
+            
+            async def handle_result(index, google_data, open_library_data):
+                nonlocal last_flush, flushing
+                for i, title, needed in title_to_rows[unique_titles[index]]:
+                    update_row(i, title, needed, google_data, open_library_data)
+                    
+                if flushing or not (len(batch) >= self.write_batch_size or
+                                    time.monotonic() - last_flush > self.write_interval):
+                    return
+                # Write in a worker thread so in-flight requests keep running;
+                # cells queued meanwhile go into the next write
+                flushing = True
+                pending = batch[:]
+                batch.clear()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._flush_updates, worksheet, pending)
+                finally:
+                    # Cells that failed to write are retried by the next flush
+                    batch[:0] = pending
+                    last_flush = time.monotonic()
+                    flushing = False
+                    
+            def update_row(i, title, needed, google_data, open_library_data):
+                print(f"\nProcessing: {title}")
                 
                 # Merge metadata
                 merged_data = self.merge_metadata(google_data, open_library_data)
                 
                 if merged_data:
                     # Update only empty cells
-                    updates = []
-                    if not row.get('Author'):
-                        updates.append(('Author', merged_data.get('authors', '')))
-                    if not row.get('Genre'):
-                        updates.append(('Genre', merged_data.get('categories', '')))
-                    if not row.get('Publisher'):
-                        updates.append(('Publisher', merged_data.get('publisher', '')))
-                    if not row.get('Publication Year'):
-                        updates.append(('Publication Year', merged_data.get('published_date', '')))
-                    if not row.get('ISBN'):
-                        updates.append(('ISBN', merged_data.get('isbn', '')))
+                    updates = [(field, merged_data.get(FIELD_MAPPING[field], '')) for field in needed]
                         
-                    # Apply updates
+                    # Queue updates
                     for field, value in updates:
-                        try:
-                            col_idx = worksheet.find(field).col
-                            worksheet.update_cell(i, col_idx, value)
-                            print(f"Updated {field}: {value}")
-                        except Exception as e:
-                            print(f"Error updating {field}: {e}")
-                    
+                        batch.append({
+                            'range': gspread.utils.rowcol_to_a1(i, col_map[field]),
+                            'values': [[value]]
+                        })
+                        print(f"Queued {field}: {value}")
+                        
                     if updates:
-                        print(f"Successfully updated metadata for: {title}")
+                        print(f"Queued metadata updates for: {title}")
                     else:
                         print(f"No new metadata to update for: {title}")
                 else:
                     print(f"No metadata found for: {title}")
                     
+            # Get metadata from both APIs for all books at once
+            row_count = sum(len(group) for group in title_to_rows.values())
+            print(f"Fetching metadata for {row_count} books ({len(books)} unique titles)...")
+            try:
+                asyncio.run(self._fetch_all(books, handle_result))
+            finally:
+                # Write any remaining updates, even if the run was interrupted
+                self._flush_updates(worksheet, batch)
+            
         except gspread.exceptions.SpreadsheetNotFound:
             print(f"Error: Could not find spreadsheet '{spreadsheet_name}'. Please check the name and permissions.")
         except gspread.exceptions.WorksheetNotFound:
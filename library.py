@@ -1,20 +1,110 @@
+import asyncio
+import aiohttp
 import gspread
+import orjson
+from rapidfuzz import fuzz, process
 from google.oauth2.service_account import Credentials
-import requests
+from google.auth.transport.requests import AuthorizedSession
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
 import time
 import socket
 import logging
 import json
 import os
+import shelve
+import hashlib
+import functools
+import gzip
+import re
+import sys
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, fields
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
 from datetime import datetime
 
-@dataclass
+# Four-digit publication year (1900-2099)
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+
+# Metadata fields Open Library can supply when Google Books leaves them blank
+MERGEABLE_FIELDS = ('authors', 'publisher', 'published_date', 'isbn',
+                    'categories', 'page_count', 'language')
+
+# HTTP status codes worth retrying (429 for rate limiting)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Check whether a failed API call should be retried."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in RETRY_STATUSES
+    return isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+class _TokenBucket:
+    """Token bucket allowing bursts of `capacity` calls while averaging `rate` calls per second."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        
+    async def acquire(self):
+        """Reserve a token and wait until it is due.
+        
+        The reservation itself never yields, so it is atomic on the event loop;
+        only the wait for a token in deficit is spent asleep.
+        """
+        self._refill()
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+            
+    def drain(self):
+        """Drop any saved-up burst so queued calls slow down after a 429."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+def _disk_cached(api_name: str):
+    """Cache a metadata search on disk, keyed by API and normalized (title, author).
+    
+    Only completed lookups are stored (including "not found"); network errors
+    propagate uncached so they are retried on the next run.
+    """
+    def decorator(search):
+        @functools.wraps(search)
+        async def wrapper(self, title: str, author: str) -> Optional['BookMetadata']:
+            if self._cache is None:
+                return await search(self, title, author)
+                
+            key = hashlib.blake2b(
+                f'{api_name}|{title.lower().strip()}|{author.lower().strip()}'.encode(),
+                digest_size=16
+            ).hexdigest()
+            
+            entry = self._cache.get(key)
+            if entry and time.time() - entry['cached_at'] < self._cache_ttl:
+                self.logger.debug(f"Cache hit ({api_name}): {title}")
+                return BookMetadata(**entry['data']) if entry['data'] else None
+                
+            result = await search(self, title, author)
+            self._cache[key] = {
+                'cached_at': time.time(),
+                'data': asdict(result) if result else None
+            }
+            return result
+        return wrapper
+    return decorator
+
+# slots=True (Python 3.10+) drops the per-instance __dict__; older Pythons get a regular dataclass
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class BookMetadata:
     """Data class for book metadata."""
     title: str = ""
@@ -50,21 +140,27 @@ class BookMetadataUpdater:
         self.GOOGLE_BOOKS_API_URL = "https://www.googleapis.com/books/v1/volumes"
         self.OPEN_LIBRARY_API_URL = "https://openlibrary.org/search.json"
         
-        # Configure retry strategy
-        self.retry_strategy = Retry(
-            total=self.config.get('retry_attempts', 5),
-            backoff_factor=self.config.get('backoff_factor', 1),
-            status_forcelist=[429, 500, 502, 503, 504],  # Added 429 for rate limiting
-            allowed_methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
-        )
+        # Event loop, HTTP session and concurrency limit, kept alive across batches
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        
+        # Rate limiting: one token bucket per API, bursting up to max_workers calls
+        min_delay = self.config.get('rate_limit_delay', 1.0)
+        self._rate_limiters = {}
+        if min_delay > 0:
+            self._rate_limiters = {
+                api_name: _TokenBucket(rate=1.0 / min_delay, capacity=self.config.get('max_workers', 3))
+                for api_name in ('google_books', 'open_library')
+            }
+        self._backoff = wait_exponential(multiplier=self.config.get('backoff_factor', 1))
         
-        # Create session with retry strategy
-        self.http = requests.Session()
-        self.http.mount("https://", HTTPAdapter(max_retries=self.retry_strategy))
+        # Persistent API response cache, opened for the duration of update_sheet
+        self._cache: Optional[shelve.Shelf] = None
+        self._cache_ttl = self.config.get('cache_ttl_days', 30) * 24 * 60 * 60
         
-        # Rate limiting
-        self._api_lock = threading.Lock()
-        self._last_request_time = {}
+        # Connectivity check result is trusted until this monotonic time
+        self._net_ok_until = 0.0
         
         # Progress tracking
         self.processed_count = 0
@@ -83,6 +179,9 @@ class BookMetadataUpdater:
             "sheet_name": "Books",
             "log_level": "INFO",
             "backup_enabled": True,
+            "cache_enabled": True,
+            "cache_ttl_days": 30,
+            "google_books_api_key": "",
             "field_mapping": {
                 "Title": "title",
                 "Author": "authors", 
@@ -136,20 +235,34 @@ class BookMetadataUpdater:
         self.logger.info(f"Logging initialized. Log file: {log_file}")
 
     def check_internet_connection(self) -> bool:
-        """Test internet connectivity with multiple endpoints."""
+        """Test internet connectivity with multiple endpoints, caching a success for 30 seconds."""
+        if time.monotonic() < self._net_ok_until:
+            return True
+            
         test_endpoints = [
             ("8.8.8.8", 53),      # Google DNS
             ("1.1.1.1", 53),      # Cloudflare DNS
             ("208.67.222.222", 53) # OpenDNS
         ]
         
-        for host, port in test_endpoints:
+        def probe(endpoint: Tuple[str, int]) -> bool:
             try:
-                socket.create_connection((host, port), timeout=3)
+                socket.create_connection(endpoint, timeout=3).close()
                 return True
             except OSError:
-                continue
-        return False
+                return False
+        
+        # Probe all endpoints at once and stop at the first that answers
+        executor = ThreadPoolExecutor(max_workers=len(test_endpoints))
+        try:
+            futures = [executor.submit(probe, endpoint) for endpoint in test_endpoints]
+            for future in as_completed(futures):
+                if future.result():
+                    self._net_ok_until = time.monotonic() + 30
+                    return True
+            return False
+        finally:
+            executor.shutdown(wait=False)
 
     def authenticate_google_sheets(self):
         """Authenticate with Google Sheets API using service account."""
@@ -164,159 +277,190 @@ class BookMetadataUpdater:
                 self.credentials_file,
                 scopes=self.SCOPES
             )
-            return gspread.authorize(creds)
+            
+            # One pooled, retrying session serves all Sheets and Drive traffic
+            session = AuthorizedSession(creds)
+            retry_strategy = Retry(
+                total=self.config.get('retry_attempts', 5),
+                backoff_factor=self.config.get('backoff_factor', 1),
+                status_forcelist=list(RETRY_STATUSES),
+                allowed_methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
+            )
+            session.mount("https://", HTTPAdapter(pool_maxsize=20, max_retries=retry_strategy))
+            return gspread.Client(auth=creds, session=session)
         except Exception as e:
             self.logger.error(f"Authentication failed: {str(e)}")
             raise
 
-    def _rate_limit(self, api_name: str):
+    async def _rate_limit(self, api_name: str):
         """Implement rate limiting for API calls."""
-        with self._api_lock:
-            now = time.time()
-            if api_name in self._last_request_time:
-                elapsed = now - self._last_request_time[api_name]
-                min_delay = self.config.get('rate_limit_delay', 1.0)
-                if elapsed < min_delay:
-                    time.sleep(min_delay - elapsed)
-            self._last_request_time[api_name] = time.time()
-
-    def get_google_books_data(self, title: str, author: str = "") -> Optional[BookMetadata]:
+        bucket = self._rate_limiters.get(api_name)
+        if bucket:
+            await bucket.acquire()
+
+    def _retry_wait(self, retry_state) -> float:
+        """Honor Retry-After on 429 responses, otherwise back off exponentially."""
+        exc = retry_state.outcome.exception()
+        if isinstance(exc, aiohttp.ClientResponseError) and exc.status == 429:
+            retry_after = (exc.headers or {}).get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), 60)
+        return self._backoff(retry_state)
+
+    async def _fetch_json(self, api_name: str, url: str, params: Dict) -> Dict:
+        """GET a URL and decode the JSON response, retrying transient failures."""
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.config.get('retry_attempts', 5) + 1),
+            wait=self._retry_wait,
+            retry=retry_if_exception(_is_retryable),
+            reraise=True
+        ):
+            with attempt:
+                await self._rate_limit(api_name)
+                async with self._sem:
+                    async with self._session.get(url, params=params,
+                                                 timeout=aiohttp.ClientTimeout(total=15)) as response:
+                        if response.status == 429:
+                            self.logger.warning(f"Rate limited by {api_name}, backing off")
+                            bucket = self._rate_limiters.get(api_name)
+                            if bucket:
+                                bucket.drain()
+                        response.raise_for_status()
+                        return orjson.loads(await response.read())
+
+    async def get_google_books_data(self, title: str, author: str = "") -> Optional[BookMetadata]:
         """Fetch book metadata from Google Books API with enhanced search."""
         if not title:
             return None
             
-        self._rate_limit('google_books')
-        
         try:
-            # Enhanced search query
-            query = f'intitle:"{title}"'
-            if author:
-                query += f' inauthor:"{author}"'
-                
-            params = {
-                'q': query, 
-                'maxResults': 5,  # Get more results for better matching
-                'printType': 'books'
-            }
-            
-            response = self.http.get(self.GOOGLE_BOOKS_API_URL, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'items' in data and len(data['items']) > 0:
-                # Find best match by title similarity
-                best_match = self._find_best_book_match(title, data['items'])
-                if best_match:
-                    book_info = best_match['volumeInfo']
-                    
-                    # Extract ISBN (prefer ISBN-13, fallback to ISBN-10)
-                    isbn = ""
-                    for identifier in book_info.get('industryIdentifiers', []):
-                        if identifier['type'] == 'ISBN_13':
-                            isbn = identifier['identifier']
-                            break
-                        elif identifier['type'] == 'ISBN_10' and not isbn:
-                            isbn = identifier['identifier']
-                    
-                    return BookMetadata(
-                        title=book_info.get('title', ''),
-                        authors=', '.join(book_info.get('authors', [])),
-                        publisher=book_info.get('publisher', ''),
-                        published_date=self._extract_year(book_info.get('publishedDate', '')),
-                        isbn=isbn,
-                        categories=', '.join(book_info.get('categories', [])),
-                        page_count=book_info.get('pageCount', 0),
-                        language=book_info.get('language', ''),
-                        description=book_info.get('description', '')[:500] + '...' if len(book_info.get('description', '')) > 500 else book_info.get('description', '')
-                    )
-            return None
-            
-        except requests.RequestException as e:
+            return await self._search_google_books(title, author)
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
             self.logger.error(f"Error fetching Google Books data for '{title}': {e}")
             return None
 
-    def get_open_library_data(self, title: str, author: str = "") -> Optional[BookMetadata]:
+    @_disk_cached('google_books')
+    async def _search_google_books(self, title: str, author: str) -> Optional[BookMetadata]:
+        """Query Google Books and return the best matching result."""
+        # Enhanced search query
+        query = f'intitle:"{title}"'
+        if author:
+            query += f' inauthor:"{author}"'
+
+        params = {
+            'q': query, 
+            'maxResults': 40,  # API maximum; more candidates give better matching
+            'printType': 'books',
+            # Partial response: only the volume fields we read
+            'fields': 'items(volumeInfo(title,authors,publisher,publishedDate,industryIdentifiers,'
+                      'categories,pageCount,language,description))'
+        }
+        # An API key moves requests off the shared anonymous per-IP quota
+        api_key = self.config.get('google_books_api_key')
+        if api_key:
+            params['key'] = api_key
+
+        data = await self._fetch_json('google_books', self.GOOGLE_BOOKS_API_URL, params)
+
+        if 'items' in data and len(data['items']) > 0:
+            # Find best match by title similarity
+            best_match = self._find_best_book_match(title, data['items'])
+            if best_match:
+                book_info = best_match['volumeInfo']
+
+                # Extract ISBN (prefer ISBN-13, fallback to ISBN-10)
+                isbn = ""
+                for identifier in book_info.get('industryIdentifiers', []):
+                    if identifier['type'] == 'ISBN_13':
+                        isbn = identifier['identifier']
+                        break
+                    elif identifier['type'] == 'ISBN_10' and not isbn:
+                        isbn = identifier['identifier']
+
+                # Truncate long descriptions
+                description = book_info.get('description') or ''
+                if len(description) > 500:
+                    description = description[:500] + '...'
+
+                return BookMetadata(
+                    title=book_info.get('title', ''),
+                    authors=', '.join(book_info.get('authors') or []),
+                    publisher=book_info.get('publisher', ''),
+                    published_date=self._extract_year(book_info.get('publishedDate', '')),
+                    isbn=isbn,
+                    categories=', '.join(book_info.get('categories') or []),
+                    page_count=book_info.get('pageCount', 0),
+                    language=book_info.get('language', ''),
+                    description=description
+                )
+        return None
+
+    async def get_open_library_data(self, title: str, author: str = "") -> Optional[BookMetadata]:
         """Fetch book metadata from Open Library API with enhanced search."""
         if not title:
             return None
             
-        self._rate_limit('open_library')
-        
         try:
-            params = {
-                'title': title,
-                'limit': 5
-            }
-            if author:
-                params['author'] = author
-                
-            response = self.http.get(self.OPEN_LIBRARY_API_URL, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'docs' in data and len(data['docs']) > 0:
-                # Find best match
-                best_match = self._find_best_book_match(title, data['docs'], 'title')
-                if best_match:
-                    return BookMetadata(
-                        title=best_match.get('title', ''),
-                        authors=', '.join(best_match.get('author_name', [])),
-                        publisher=', '.join(best_match.get('publisher', [])[:3]),  # Limit publishers
-                        published_date=str(best_match.get('first_publish_year', '')),
-                        isbn=next(iter(best_match.get('isbn', [])), ''),
-                        categories=', '.join(best_match.get('subject', [])[:5]),  # Limit subjects
-                        page_count=best_match.get('number_of_pages_median', 0),
-                        language=', '.join(best_match.get('language', [])[:2])  # Limit languages
-                    )
-            return None
-            
-        except requests.RequestException as e:
+            return await self._search_open_library(title, author)
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
             self.logger.error(f"Error fetching Open Library data for '{title}': {e}")
             return None
 
+    @_disk_cached('open_library')
+    async def _search_open_library(self, title: str, author: str) -> Optional[BookMetadata]:
+        """Query Open Library and return the best matching result."""
+        params = {
+            'title': title,
+            'limit': 20,
+            # Only the document fields we read
+            'fields': 'title,author_name,publisher,first_publish_year,isbn,subject,'
+                      'number_of_pages_median,language'
+        }
+        if author:
+            params['author'] = author
+
+        data = await self._fetch_json('open_library', self.OPEN_LIBRARY_API_URL, params)
+
+        if 'docs' in data and len(data['docs']) > 0:
+            # Find best match
+            best_match = self._find_best_book_match(title, data['docs'], 'title')
+            if best_match:
+                return BookMetadata(
+                    title=best_match.get('title', ''),
+                    authors=', '.join(best_match.get('author_name', [])),
+                    publisher=', '.join(best_match.get('publisher', [])[:3]),  # Limit publishers
+                    published_date=str(best_match.get('first_publish_year', '')),
+                    isbn=next(iter(best_match.get('isbn', [])), ''),
+                    categories=', '.join(best_match.get('subject', [])[:5]),  # Limit subjects
+                    page_count=best_match.get('number_of_pages_median', 0),
+                    language=', '.join(best_match.get('language', [])[:2])  # Limit languages
+                )
+        return None
+
     def _find_best_book_match(self, target_title: str, items: List[Dict], title_key: str = None) -> Optional[Dict]:
         """Find the best matching book from search results."""
         if not items:
             return None
             
         target_title_lower = target_title.lower().strip()
-        best_match = None
-        best_score = 0
-        
-        for item in items:
-            if title_key:
-                item_title = item.get(title_key, '')
-            else:
-                item_title = item.get('volumeInfo', {}).get('title', '')
-                
-            if not item_title:
-                continue
-                
-            item_title_lower = item_title.lower().strip()
-            
-            # Calculate similarity score
-            score = self._calculate_title_similarity(target_title_lower, item_title_lower)
-            
-            if score > best_score:
-                best_score = score
-                best_match = item
-                
-        # Only return match if similarity is above threshold
-        return best_match if best_score > 0.6 else items[0]  # Fallback to first result
+        if title_key:
+            item_titles = [item.get(title_key) or '' for item in items]
+        else:
+            item_titles = [item.get('volumeInfo', {}).get('title') or '' for item in items]
 
-    def _calculate_title_similarity(self, title1: str, title2: str) -> float:
-        """Calculate similarity between two titles."""
-        # Simple similarity calculation based on common words
-        words1 = set(title1.split())
-        words2 = set(title2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-            
-        intersection = words1 & words2
-        union = words1 | words2
-        
-        return len(intersection) / len(union) if union else 0.0
+        # Score every candidate in one call; token set ratio ignores word order,
+        # duplicates and extra words on either side
+        matches = process.extract(target_title_lower,
+                                  [t.lower().strip() for t in item_titles],
+                                  scorer=fuzz.token_set_ratio, limit=None)
+        # Any title containing all the query's words scores 100 ("Dune" vs "Dune Messiah"),
+        # so break ties at the top score by plain similarity to prefer the closest title
+        top_score = matches[0][1]
+        _, best_score, best_idx = max((m for m in matches if m[1] == top_score),
+                                      key=lambda m: fuzz.ratio(target_title_lower, m[0]))
+
+        # Only return match if similarity is above threshold
+        return items[best_idx] if best_score > 60 else items[0]  # Fallback to first result
 
     def _extract_year(self, date_string: str) -> str:
         """Extract year from date string."""
@@ -324,43 +468,64 @@ class BookMetadataUpdater:
             return ""
         
         # Try to extract 4-digit year
-        import re
-        year_match = re.search(r'\b(19|20)\d{2}\b', date_string)
+        year_match = _YEAR_RE.search(date_string)
         return year_match.group() if year_match else date_string[:4]
 
     def merge_metadata(self, google_data: Optional[BookMetadata], 
                       open_library_data: Optional[BookMetadata]) -> Optional[BookMetadata]:
         """Merge metadata from both APIs with intelligent preference."""
-        if not google_data and not open_library_data:return None
+        # Nothing to merge unless both APIs returned data
+        if not google_data or not open_library_data:
+            return google_data or open_library_data
             
         # Start with Google Books data (generally more reliable)
-        if google_data:
-            merged = google_data
-        else:
-            merged = open_library_data
-            return merged
-            
+        merged = google_data
+        
         # Fill in missing fields from Open Library
-        if open_library_data:
-            if not merged.authors and open_library_data.authors:
-                merged.authors = open_library_data.authors
-            if not merged.publisher and open_library_data.publisher:
-                merged.publisher = open_library_data.publisher
-            if not merged.published_date and open_library_data.published_date:
-                merged.published_date = open_library_data.published_date
-            if not merged.isbn and open_library_data.isbn:
-                merged.isbn = open_library_data.isbn
-            if not merged.categories and open_library_data.categories:
-                merged.categories = open_library_data.categories
-            if not merged.page_count and open_library_data.page_count:
-                merged.page_count = open_library_data.page_count
-            if not merged.language and open_library_data.language:
-                merged.language = open_library_data.language
+        for field in fields(BookMetadata):
+            if not getattr(merged, field.name):
+                value = getattr(open_library_data, field.name)
+                if value:
+                    setattr(merged, field.name, value)
                 
         return merged
 
-    def backup_sheet(self, worksheet) -> str:
-        """Create a backup of the current sheet data."""
+    def _open_cache(self):
+        """Open the on-disk API response cache if enabled."""
+        if not self.config.get('cache_enabled', True) or self._cache is not None:
+            return
+            
+        try:
+            os.makedirs('cache', exist_ok=True)
+            self._cache = shelve.open('cache/metadata.db')
+        except Exception as e:
+            self.logger.warning(f"Could not open metadata cache, continuing without it: {e}")
+            self._cache = None
+
+    def _close_cache(self):
+        """Flush and close the on-disk API response cache."""
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def _read_sheet(self, worksheet) -> Tuple[List[str], List[Dict]]:
+        """Read the header row and all records in a single batchGet request."""
+        if worksheet.row_count < 2:
+            ranges = worksheet.batch_get(['1:1'])
+            ranges.append([])
+        else:
+            ranges = worksheet.batch_get(['1:1', f'2:{worksheet.row_count}'])
+            
+        headers = ranges[0][0] if ranges[0] else []
+        # The API trims trailing empty cells, so pad each row to the header width
+        records = [
+            dict(zip(headers, row + [''] * (len(headers) - len(row))))
+            for row in ranges[1]
+        ]
+        return headers, records
+
+    def backup_sheet(self, worksheet, records: Optional[List[Dict]] = None) -> str:
+        """Create a backup of the current sheet data (read from the sheet unless given)."""
         if not self.config.get('backup_enabled', True):
             return ""
             
@@ -369,11 +534,17 @@ class BookMetadataUpdater:
             backup_dir = 'backups'
             os.makedirs(backup_dir, exist_ok=True)
             
-            backup_file = f"{backup_dir}/sheet_backup_{timestamp}.json"
+            backup_file = f"{backup_dir}/sheet_backup_{timestamp}.jsonl.gz"
             
-            records = worksheet.get_all_records()
-            with open(backup_file, 'w') as f:
-                json.dump(records, f, indent=2)
+            if records is None:
+                values = worksheet.get_all_values()
+                headers = values[0] if values else []
+                records = (dict(zip(headers, row)) for row in values[1:])
+                
+            # Stream one JSON object per row; fast gzip keeps the file small
+            with gzip.open(backup_file, 'wb', compresslevel=1) as f:
+                for record in records:
+                    f.write(orjson.dumps(record) + b'\n')
                 
             self.logger.info(f"Backup created: {backup_file}")
             return backup_file
@@ -382,28 +553,87 @@ class BookMetadataUpdater:
             self.logger.error(f"Failed to create backup: {e}")
             return ""
 
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create the pooled HTTP session shared by both metadata APIs."""
+        max_workers = self.config.get('max_workers', 3)
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=max_workers * 2,  # Enough keep-alive connections per API host
+            keepalive_timeout=60,
+            ttl_dns_cache=300  # Resolve each API host once rather than every 10 seconds
+        )
+        return aiohttp.ClientSession(connector=connector, headers={'Accept-Encoding': 'gzip, deflate'})
+
     def process_book_batch(self, books_batch: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict, Optional[BookMetadata]]]:
         """Process a batch of books concurrently."""
-        results = []
+        # Reuse one event loop for the whole run so the session and its pool survive between batches
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self._process_book_batch_async(books_batch))
+
+    def close(self):
+        """Close the HTTP session and event loop used for API calls."""
+        if self._loop is None:
+            return
+            
+        if self._session is not None:
+            self._loop.run_until_complete(self._session.close())
+            self._session = None
+        self._sem = None
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+        self._loop = None
+
+    async def _process_book_batch_async(self, books_batch: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict, Optional[BookMetadata]]]:
+        """Process a batch of books concurrently on a single event loop.
         
-        with ThreadPoolExecutor(max_workers=min(len(books_batch), self.config.get('max_workers', 3))) as executor:
-            future_to_book = {
-                executor.submit(self._process_single_book, row_idx, book): (row_idx, book)
-                for row_idx, book in books_batch
-            }
-            
-            for future in as_completed(future_to_book):
-                row_idx, book = future_to_book[future]
-                try:
-                    metadata = future.result()
-                    results.append((row_idx, book, metadata))
-                except Exception as e:
-                    self.logger.error(f"Error processing book '{book.get('Title', '')}': {e}")
-                    results.append((row_idx, book, None))
+        Rows sharing the same normalized title and author are looked up once and
+        the result is fanned out to every copy.
+        """
+        # Created on first use, inside the running loop they are bound to
+        if self._session is None:
+            self._session = self._create_session()
+            self._sem = asyncio.Semaphore(self.config.get('max_workers', 3))
+        
+        # Group duplicate rows so each distinct book is queried only once
+        unique_books: Dict[Tuple[str, str], Dict] = {}
+        for _, book in books_batch:
+            key = self._book_key(book)
+            if key[0] and key not in unique_books:
+                unique_books[key] = book
+        
+        outcomes = await asyncio.gather(
+            *(self._process_single_book(book) for book in unique_books.values()),
+            return_exceptions=True
+        )
+        
+        metadata_by_key = {}
+        for (key, book), outcome in zip(unique_books.items(), outcomes):
+            if isinstance(outcome, Exception):
+                self.logger.error(f"Error processing book '{book.get('Title', '')}': {outcome}")
+                outcome = None
+            metadata_by_key[key] = outcome
+        
+        results = []
+        for row_idx, book in books_batch:
+            key = self._book_key(book)
+            metadata = None
+            if key[0]:
+                metadata = metadata_by_key[key]
+                self.processed_count += 1
+                if not metadata:
+                    self.failed_count += 1
+            results.append((row_idx, book, metadata))
                     
         return results
 
-    def _process_single_book(self, row_idx: int, book: Dict) -> Optional[BookMetadata]:
+    @staticmethod
+    def _book_key(book: Dict) -> Tuple[str, str]:
+        """Normalized (title, author) used to spot duplicate rows."""
+        return (str(book.get('Title', '')).strip().lower(),
+                str(book.get('Author', '')).strip().lower())
+
+    async def _process_single_book(self, book: Dict) -> Optional[BookMetadata]:
         """Process a single book to get metadata."""
         title = str(book.get('Title', '')).strip()
         author = str(book.get('Author', '')).strip()
@@ -413,20 +643,30 @@ class BookMetadataUpdater:
             
         self.logger.info(f"Processing: {title}")
         
-        # Get metadata from both APIs
-        google_data = self.get_google_books_data(title, author)
-        open_library_data = self.get_open_library_data(title, author)
+        # Query both APIs concurrently, but drop Open Library if Google Books
+        # already filled every field it could contribute
+        google_task = asyncio.ensure_future(self.get_google_books_data(title, author))
+        open_library_task = asyncio.ensure_future(self.get_open_library_data(title, author))
+        try:
+            google_data = await google_task
+        except BaseException:
+            open_library_task.cancel()
+            raise
+            
+        if google_data and all(getattr(google_data, field) for field in MERGEABLE_FIELDS):
+            open_library_task.cancel()
+            open_library_data = None
+            self.logger.debug(f"Google Books record complete, skipped Open Library for: {title}")
+        else:
+            open_library_data = await open_library_task
         
         # Merge metadata
         merged_data = self.merge_metadata(google_data, open_library_data)
         
-        self.processed_count += 1
-        
         if merged_data:
             self.logger.info(f"Found metadata for: {title}")
         else:
             self.logger.warning(f"No metadata found for: {title}")
-            self.failed_count += 1
             
         return merged_data
 
@@ -460,12 +700,13 @@ class BookMetadataUpdater:
             spreadsheet = gc.open(spreadsheet_name)
             worksheet = spreadsheet.worksheet(sheet_name)
             
-            # Create backup
-            backup_file = self.backup_sheet(worksheet)
-            
-            # Get all records
+            # Read the sheet once; the backup and the update share this snapshot
             self.logger.info("Fetching existing records...")
-            records = worksheet.get_all_records()
+            headers, records = self._read_sheet(worksheet)
+            header_idx = {header: idx for idx, header in enumerate(headers)}
+            
+            # Create backup
+            backup_file = self.backup_sheet(worksheet, records)
             
             if not records:
                 self.logger.warning("No records found in the sheet.")
@@ -481,6 +722,8 @@ class BookMetadataUpdater:
             
             self.logger.info(f"Processing {total_books} books in batches of {batch_size}")
             
+            self._open_cache()
+            
             # Process books in batches
             for i in range(0, total_books, batch_size):
                 batch_end = min(i + batch_size, total_books)
@@ -490,12 +733,27 @@ class BookMetadataUpdater:
                 
                 batch_results = self.process_book_batch(batch)
                 
-                # Update sheet with batch results
+                # Collect cell updates for the whole batch
+                batch_updates = []
+                updated_titles = []
                 for row_idx, book, metadata in batch_results:
                     if metadata:
-                        success = self._update_book_row(worksheet, row_idx, book, metadata, dry_run)
-                        if success:
-                            self.updated_count += 1
+                        cell_updates = self._update_book_row(row_idx, book, metadata, header_idx, dry_run)
+                        if cell_updates:
+                            batch_updates.extend(cell_updates)
+                            updated_titles.append(book.get('Title', ''))
+                
+                # Write the whole batch in a single request
+                if dry_run:
+                    self.updated_count += len(updated_titles)
+                elif batch_updates:
+                    try:
+                        worksheet.batch_update(batch_updates, value_input_option='USER_ENTERED')
+                        for title in updated_titles:
+                            self.logger.info(f"Successfully updated: {title}")
+                        self.updated_count += len(updated_titles)
+                    except Exception as e:
+                        self.logger.error(f"Error writing updates for batch {i//batch_size + 1}: {e}")
                 
                 # Progress update
                 progress = min(batch_end, total_books)
@@ -519,46 +777,52 @@ class BookMetadataUpdater:
         except Exception as e:
             self.logger.error(f"Error updating sheet: {e}")
             return False
+        finally:
+            self.close()
+            self._close_cache()
 
-    def _update_book_row(self, worksheet, row_idx: int, book: Dict, 
-                        metadata: BookMetadata, dry_run: bool = False) -> bool:
-        """Update a single book row with metadata."""
+    def _update_book_row(self, row_idx: int, book: Dict, metadata: BookMetadata,
+                        header_idx: Dict[str, int], dry_run: bool = False) -> List[Dict]:
+        """Build the cell updates that fill a single book row with metadata."""
         try:
             field_mapping = self.config.get('field_mapping', {})
             updates = []
             
+            # Sheet values are already strings; only blank cells can be filled
+            blank_fields = {field for field, value in book.items() if not value or value.isspace()}
+            
             # Check which fields need updating
             for sheet_field, metadata_field in field_mapping.items():
-                current_value = str(book.get(sheet_field, '')).strip()
-                new_value = str(getattr(metadata, metadata_field, '')).strip()
-                
-                if not current_value and new_value:
+                if sheet_field not in blank_fields:
+                    continue
+                new_value = getattr(metadata, metadata_field, '')
+                if not new_value:
+                    continue
+                new_value = str(new_value).strip()
+                if new_value:
                     updates.append((sheet_field, new_value))
             
             if not updates:
                 self.logger.debug(f"No updates needed for: {book.get('Title', '')}")
-                return False
+                return []
             
             if dry_run:
                 self.logger.info(f"DRY RUN - Would update {book.get('Title', '')} with: {updates}")
-                return True
             
-            # Apply updates
+            cell_updates = []
             for field, value in updates:
-                try:
-                    col_idx = worksheet.find(field).col
-                    worksheet.update_cell(row_idx, col_idx, value)
-                    self.logger.debug(f"Updated {field}: {value}")
-                except Exception as e:
-                    self.logger.error(f"Error updating {field}: {e}")
-                    return False
-            
-            self.logger.info(f"Successfully updated: {book.get('Title', '')}")
-            return True
+                if field not in header_idx:
+                    self.logger.error(f"Error updating {field}: column not found")
+                    continue
+                cell_range = gspread.utils.rowcol_to_a1(row_idx, header_idx[field] + 1)
+                cell_updates.append({'range': cell_range, 'values': [[value]]})
+                self.logger.debug(f"Queued {field}: {value}")
+            
+            return cell_updates
             
         except Exception as e:
             self.logger.error(f"Error updating row {row_idx}: {e}")
-            return False
+            return []
 
     def validate_sheet_structure(self, spreadsheet_name: str = None, 
                                 sheet_name: str = None) -> bool: